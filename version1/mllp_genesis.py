@@ -1,16 +1,30 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import atexit
+import errno
+import itertools
 import json
 import os
 import shutil
+import signal
 import socket
 import ssl
 import struct
 import sys
+import threading
 import time
-import random
-from datetime import datetime, timezone
-from typing import Optional, Tuple, List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Optional, Tuple, List, Dict
+
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 
 START_BLOCK = b"\x0B"
 END_BLOCK = b"\x1C\x0D"
@@ -21,159 +35,458 @@ READY_DIR = os.path.join(BASE_DIR, "ready")
 SENT_DIR = os.path.join(BASE_DIR, "sent")
 FAILED_DIR = os.path.join(BASE_DIR, "failed")
 ARCHIVE_DIR = os.path.join(BASE_DIR, "archive")
+# separator-terminated prefixes for plain concatenation in the per-file loops
+_READY = READY_DIR + os.sep
+_SENT = SENT_DIR + os.sep
+_FAILED = FAILED_DIR + os.sep
+_ARCHIVE = ARCHIVE_DIR + os.sep
 META_EXT = ".meta.json"
+META_LOG = "queue_meta.jsonl"
+META_LOG_FLUSH_EVERY = 64
+RECV_BUFFER_SIZE = 64 * 1024
+# below this a single framed sendall beats three sends plus sendfile setup
+SENDFILE_MIN_SIZE = 64 * 1024
+# validating a file takes ~10us; below this many files the pool's ~10ms startup costs more than it saves
+PARALLEL_VALIDATE_MIN_FILES = 1024
 
 DEFAULT_ACK_TEMPLATE = (
     "UNA:+.? '\n"
     "UNB+ACK+RECEIVER+SENDER+{ts}'\n"
     "UNZ+1+ACK\n"
-).replace("{ts}", datetime.utcnow().strftime("%Y%m%d%H%M%S"))
+)
+
+# (second, YYYYMMDDHHMMSS, YYYY-MM-DDTHH:MM:SS): formatted once per wall-clock second, shared by both formatters
+_utc_fields_cache: Tuple[int, str, str] = (-1, "", "")
+
+def _utc_fields(sec: int) -> Tuple[str, str]:
+    global _utc_fields_cache
+    cached_sec, ts, iso = _utc_fields_cache
+    if sec != cached_sec:
+        t = time.gmtime(sec)
+        ts = f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
+        iso = f"{ts[0:4]}-{ts[4:6]}-{ts[6:8]}T{ts[8:10]}:{ts[10:12]}:{ts[12:14]}"
+        _utc_fields_cache = (sec, ts, iso)
+    return ts, iso
+
+def _ts14(ns: Optional[int] = None) -> str:
+    return _utc_fields((time.time_ns() if ns is None else ns) // 1_000_000_000)[0]
 
-os.makedirs(GEN_DIR, exist_ok=True)
-os.makedirs(READY_DIR, exist_ok=True)
-os.makedirs(SENT_DIR, exist_ok=True)
-os.makedirs(FAILED_DIR, exist_ok=True)
-os.makedirs(ARCHIVE_DIR, exist_ok=True)
+def _utc_isoformat(ns: Optional[int] = None) -> str:
+    if ns is None:
+        ns = time.time_ns()
+    return f"{_utc_fields(ns // 1_000_000_000)[1]}.{ns // 1000 % 1_000_000:06d}+00:00"
+
+# process-unique, monotonically increasing refs; the time-derived seed keeps separate runs apart
+_msg_counter = itertools.count(time.time_ns() & 0xFFFFFF)
+
+def _next_ref() -> str:
+    return f"MSG{next(_msg_counter):06X}"
+
+def _default_ack() -> str:
+    return DEFAULT_ACK_TEMPLATE.replace("{ts}", _ts14())
+
+# state directories are created on first write, not at import; read-only commands touch nothing
+_ensured: set = set()
+
+def _ensure_dir(d: str):
+    if d in _ensured:
+        return
+    os.makedirs(d, exist_ok=True)
+    _ensured.add(d)
 
 def frame_message(payload: bytes) -> bytes:
     return START_BLOCK + payload + END_BLOCK
 
 def extract_frames(buffer: bytearray) -> List[bytes]:
     frames = []
-    while True:
+    pos = 0
+    with memoryview(buffer) as mv:
+        while True:
+            start = buffer.find(START_BLOCK, pos)
+            if start < 0:
+                break
+            end = buffer.find(END_BLOCK, start + 1)
+            if end < 0:
+                break
+            frames.append(bytes(mv[start + 1:end]))
+            pos = end + len(END_BLOCK)
+    # compact once; the view must be released before the bytearray can shrink
+    if pos:
+        del buffer[:pos]
+    return frames
+
+SocketOption = Tuple[int, int, int]
+
+class SocketOptionError(Exception):
+    pass
+
+def apply_socket_options(sock: socket.socket, socket_options: Optional[List[SocketOption]] = None):
+    # small request/response exchange: disable Nagle so the frame is not held back waiting for the peer's delayed ACK
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if hasattr(socket, "TCP_QUICKACK"):
         try:
-            start = buffer.index(START_BLOCK)
-        except ValueError:
-            break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        except OSError:
+            pass
+    for level, optname, value in socket_options or ():
         try:
-            end = buffer.index(END_BLOCK, start + 1)
-        except ValueError:
-            break
-        payload = bytes(buffer[start + 1:end])
-        frames.append(payload)
-        del buffer[:end + len(END_BLOCK)]
-    return frames
+            sock.setsockopt(level, optname, value)
+        except OSError as e:
+            raise SocketOptionError(f"sockopt_error:{optname}:{e.errno}") from e
 
-def mllp_send(host: str, port: int, payload: bytes, timeout: float = 10.0,
-              tls: bool = False, cafile: Optional[str] = None) -> Optional[bytes]:
-    try:
-        raw = socket.create_connection((host, port), timeout=timeout)
-    except Exception as e:
-        return None
-    conn = raw
-    if tls:
-        context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-        if cafile:
-            context = ssl.create_default_context(cafile=cafile)
+def _open_socket(host: str, port: int, timeout: float,
+                 socket_options: Optional[List[SocketOption]] = None) -> socket.socket:
+    # options go on before connect() so buffer sizes shape the window negotiated in the handshake
+    err = None
+    for family, type_, proto, _, addr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        sock = socket.socket(family, type_, proto)
+        try:
+            apply_socket_options(sock, socket_options)
+            sock.settimeout(timeout)
+            sock.connect(addr)
+            return sock
+        except SocketOptionError:
+            sock.close()
+            raise
+        except OSError as e:
+            sock.close()
+            err = e
+    raise err or OSError(f"getaddrinfo returned no addresses for {host}")
+
+_tls_ctx_cache: Dict[Optional[str], ssl.SSLContext] = {}
+_tls_ctx_lock = threading.Lock()
+
+def _get_tls_context(cafile: Optional[str] = None) -> ssl.SSLContext:
+    # building a context loads the trust store; do it once per cafile
+    with _tls_ctx_lock:
+        context = _tls_ctx_cache.get(cafile)
+        if context is None:
+            if cafile:
+                context = ssl.create_default_context(cafile=cafile)
+            else:
+                context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+            _tls_ctx_cache[cafile] = context
+        return context
+
+class MllpClient:
+    def __init__(self, host: str, port: int, timeout: float = 10.0, tls: bool = False,
+                 cafile: Optional[str] = None, socket_options: Optional[List[SocketOption]] = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.tls = tls
+        self.cafile = cafile
+        self.socket_options = socket_options
+        self.conn = None
+        # preallocated receive buffer; _rxlen bytes of it are valid and may carry over between exchanges
+        self._rxbuf = bytearray(RECV_BUFFER_SIZE)
+        self._rxlen = 0
+        self._peer_closed = False
+        self._last_session: Optional[ssl.SSLSession] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def connect(self) -> bool:
         try:
-            conn = context.wrap_socket(raw, server_hostname=host)
+            raw = _open_socket(self.host, self.port, self.timeout, self.socket_options)
+        except SocketOptionError:
+            raise
         except Exception:
-            raw.close()
+            return False
+        conn = raw
+        if self.tls:
+            try:
+                # resume the previous session so a reconnect is an abbreviated handshake
+                conn = _get_tls_context(self.cafile).wrap_socket(raw, server_hostname=self.host,
+                                                                 session=self._last_session)
+            except Exception:
+                raw.close()
+                return False
+        conn.settimeout(self.timeout)
+        self.conn = conn
+        return True
+
+    def close(self):
+        if self.conn is not None:
+            if isinstance(self.conn, ssl.SSLSocket) and self.conn.session is not None:
+                self._last_session = self.conn.session
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+        self._rxlen = 0
+
+    def send(self, payload: Optional[bytes], payload_file: Optional[BinaryIO] = None) -> Optional[bytes]:
+        # reuses the open connection; any failure drops it so the next send reconnects
+        reused = self.conn is not None
+        if not reused and not self.connect():
             return None
-    try:
-        conn.settimeout(timeout)
-        conn.sendall(frame_message(payload))
-        buf = bytearray()
+        ack, stale = self._try_exchange(payload, payload_file)
+        if stale and reused and self.connect():
+            # peers may close after every ACK; a stale kept-alive socket is not a failed attempt
+            ack, _ = self._try_exchange(payload, payload_file)
+        return ack
+
+    def _try_exchange(self, payload: Optional[bytes],
+                      payload_file: Optional[BinaryIO]) -> Tuple[Optional[bytes], bool]:
+        rxlen = self._rxlen
+        self._peer_closed = False
+        try:
+            ack = self._exchange(payload, payload_file)
+        except (ConnectionResetError, BrokenPipeError):
+            ack = None
+            self._peer_closed = True
+        except OSError:
+            ack = None
+        # stale only if the peer hung up before any ACK byte arrived; after a timeout it may well
+        # have the frame, and resending would deliver it twice
+        stale = ack is None and self._peer_closed and self._rxlen == rxlen
+        if ack is None:
+            self.close()
+        return ack, stale
+
+    def _exchange(self, payload: Optional[bytes], payload_file: Optional[BinaryIO]) -> Optional[bytes]:
+        conn = self.conn
+        if payload_file is not None and self._use_sendfile(payload_file):
+            # cork so START, the spliced file and END leave as full segments despite TCP_NODELAY
+            cork = getattr(socket, "TCP_CORK", None)
+            if cork is not None:
+                conn.setsockopt(socket.IPPROTO_TCP, cork, 1)
+            try:
+                conn.sendall(START_BLOCK)
+                conn.sendfile(payload_file, 0)
+                conn.sendall(END_BLOCK)
+            finally:
+                if cork is not None:
+                    conn.setsockopt(socket.IPPROTO_TCP, cork, 0)
+        else:
+            if payload_file is not None:
+                payload_file.seek(0)
+                payload = payload_file.read()
+            conn.sendall(frame_message(payload))
+        buf = self._rxbuf
         start = time.time()
         while True:
-            try:
-                chunk = conn.recv(4096)
-            except socket.timeout:
-                return None
-            if not chunk:
+            frame = self._pop_frame()
+            if frame is not None:
+                return frame
+            if time.time() - start > self.timeout:
                 return None
-            buf.extend(chunk)
-            frames = extract_frames(buf)
-            if frames:
-                return frames[0]
-            if time.time() - start > timeout:
+            if self._rxlen == len(buf):
+                buf.extend(bytes(len(buf)))
+            # recv_into fills the existing buffer in place: no per-chunk bytes object, no bytearray realloc
+            n = conn.recv_into(memoryview(buf)[self._rxlen:])
+            if not n:
+                self._peer_closed = True
                 return None
+            self._rxlen += n
+
+    def _use_sendfile(self, payload_file: BinaryIO) -> bool:
+        # SSLSocket.sendfile is a plain send() loop, so TLS always takes the framed-buffer path
+        if isinstance(self.conn, ssl.SSLSocket):
+            return False
+        return os.fstat(payload_file.fileno()).st_size >= SENDFILE_MIN_SIZE
+
+    def _pop_frame(self) -> Optional[bytes]:
+        buf = self._rxbuf
+        s = buf.find(START_BLOCK, 0, self._rxlen)
+        if s < 0:
+            return None
+        e = buf.find(END_BLOCK, s + 1, self._rxlen)
+        if e < 0:
+            return None
+        frame = bytes(memoryview(buf)[s + 1:e])
+        consumed = e + len(END_BLOCK)
+        rest = self._rxlen - consumed
+        if rest:
+            buf[:rest] = buf[consumed:self._rxlen]
+        self._rxlen = rest
+        return frame
+
+def mllp_send(host: str, port: int, payload: Optional[bytes], timeout: float = 10.0,
+              tls: bool = False, cafile: Optional[str] = None,
+              socket_options: Optional[List[SocketOption]] = None,
+              payload_file: Optional[BinaryIO] = None) -> Optional[bytes]:
+    with MllpClient(host, port, timeout=timeout, tls=tls, cafile=cafile, socket_options=socket_options) as client:
+        return client.send(payload, payload_file=payload_file)
+
+async def _open_socket_async(host: str, port: int,
+                             socket_options: Optional[List[SocketOption]] = None) -> socket.socket:
+    loop = asyncio.get_running_loop()
+    err = None
+    for family, type_, proto, _, addr in await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        sock = socket.socket(family, type_, proto)
+        try:
+            apply_socket_options(sock, socket_options)
+            sock.setblocking(False)
+            await loop.sock_connect(sock, addr)
+            return sock
+        except OSError as e:
+            sock.close()
+            err = e
+        except BaseException:
+            sock.close()
+            raise
+    raise err or OSError(f"getaddrinfo returned no addresses for {host}")
+
+async def _open_connection(host: str, port: int, context: Optional[ssl.SSLContext],
+                           socket_options: Optional[List[SocketOption]] = None):
+    # configure the socket before the TCP and TLS handshakes rather than after them
+    sock = await _open_socket_async(host, port, socket_options)
+    try:
+        return await asyncio.open_connection(sock=sock, ssl=context,
+                                             server_hostname=host if context else None)
+    except BaseException:
+        sock.close()
+        raise
+
+async def _exchange_async(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: bytes) -> bytes:
+    writer.write(frame_message(payload))
+    await writer.drain()
+    return await reader.readuntil(END_BLOCK)
+
+async def mllp_send_async(host: str, port: int, payload: bytes, timeout: float = 10.0,
+                          tls: bool = False, cafile: Optional[str] = None,
+                          socket_options: Optional[List[SocketOption]] = None) -> Optional[bytes]:
+    context = _get_tls_context(cafile) if tls else None
+    try:
+        reader, writer = await asyncio.wait_for(
+            _open_connection(host, port, context, socket_options), timeout)
+    except SocketOptionError:
+        raise
+    except Exception:
+        return None
+    try:
+        # one deadline for send and ACK: drain() blocks for as long as the peer is not reading
+        data = await asyncio.wait_for(_exchange_async(reader, writer, payload), timeout)
+    except Exception:
+        # drop unsent data, otherwise wait_closed() waits for a flush that never happens
+        writer.transport.abort()
+        return None
     finally:
+        writer.close()
         try:
-            conn.close()
+            await writer.wait_closed()
         except Exception:
             pass
+    frames = extract_frames(bytearray(data))
+    return frames[0] if frames else None
 
 def simple_edifact_from_order(order: Dict) -> str:
-    now = datetime.utcnow().strftime("%Y%m%d")
-    msg_ref = order.get("message_ref", f"MSG{random.randint(1000,9999)}")
-    lines = []
-    lines.append("UNA:+.? '")
-    lines.append(f"UNB+UNOA:1+{order.get('sender','SENDER')}+{order.get('receiver','RECEIVER')}+{now}:{datetime.utcnow().strftime('%H%M')}+{msg_ref}'")
-    lines.append(f"UNH+{msg_ref}+ORDERS:D:96A:UN'")
-    lines.append(f"BGM+220+{order.get('order_number','ORD') }+9'")
-    od = order.get("order_date", now)
-    lines.append(f"DTM+137:{od}:102'")
-    parties = order.get("parties", [])
-    for p in parties:
-        qual = p.get("qualifier", "BY")
-        pid = p.get("id", "UNKNOWN")
-        name = p.get("name", "")
-        lines.append(f"NAD+{qual}+{pid}::91'")
+    ts = _ts14()
+    date_s = ts[:8]
+    time_s = ts[8:12]
+    msg_ref = order.get("message_ref")
+    if msg_ref is None:
+        msg_ref = _next_ref()
+    lines = [
+        "UNA:+.? '",
+        f"UNB+UNOA:1+{order.get('sender','SENDER')}+{order.get('receiver','RECEIVER')}+{date_s}:{time_s}+{msg_ref}'",
+        f"UNH+{msg_ref}+ORDERS:D:96A:UN'",
+        f"BGM+220+{order.get('order_number','ORD') }+9'",
+        f"DTM+137:{order.get('order_date', date_s)}:102'",
+    ]
+    add = lines.append
+    for p in order.get("parties", []):
+        add(f"NAD+{p.get('qualifier', 'BY')}+{p.get('id', 'UNKNOWN')}::91'")
+        name = p.get("name")
         if name:
-            lines.append(f"CTA+IC+{name}'")
-    items = order.get("items", [])
-    for idx, item in enumerate(items, start=1):
-        code = item.get("product_code", f"ITEM{idx}")
-        desc = item.get("description", "")
-        qty = item.get("quantity", 1)
-        price = item.get("price", "0.00")
-        lines.append(f"LIN+{idx}++{code}:EN'")
+            add(f"CTA+IC+{name}'")
+    # segments and the MOA total in one pass over the items; any unparseable line zeroes the total
+    total = 0.0
+    total_ok = True
+    for idx, item in enumerate(order.get("items", []), start=1):
+        get = item.get
+        code = get("product_code")
+        if code is None:
+            code = f"ITEM{idx}"
+        add(f"LIN+{idx}++{code}:EN'")
+        desc = get("description")
         if desc:
-            lines.append(f"IMD+F++:::{desc}'")
-        lines.append(f"QTY+21:{qty}:EA'")
-        lines.append(f"PRI+AAA:{price}:EA'")
-    total = 0
-    try:
-        for it in items:
-            total += float(it.get("quantity", 0)) * float(it.get("price", 0))
-    except Exception:
+            add(f"IMD+F++:::{desc}'")
+        add(f"QTY+21:{get('quantity', 1)}:EA'")
+        add(f"PRI+AAA:{get('price', '0.00')}:EA'")
+        if total_ok:
+            try:
+                total += float(get("quantity", 0)) * float(get("price", 0))
+            except Exception:
+                total_ok = False
+    if not total_ok:
         total = 0
-    lines.append(f"MOA+79:{total:.2f}'")
-    lines.append(f"UNT+{len(lines)+1}+{msg_ref}'")
-    lines.append(f"UNZ+1+{msg_ref}'")
+    add(f"MOA+79:{total:.2f}'")
+    add(f"UNT+{len(lines)+1}+{msg_ref}'")
+    add(f"UNZ+1+{msg_ref}'")
     return "\n".join(lines) + "\n"
 
 def save_generated_message(text: str, filename: Optional[str] = None) -> str:
     if filename is None:
-        filename = f"edi_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{random.randint(1000,9999)}.edi"
+        filename = f"edi_{_ts14()}_{_next_ref()}.edi"
+    _ensure_dir(GEN_DIR)
     path = os.path.join(GEN_DIR, filename)
     with open(path, "wb") as f:
         f.write(text.encode("utf-8"))
     return path
 
+def _find_segment(data: bytes, tag: bytes, boundary: bytes, start: int = 0) -> int:
+    # a segment tag only counts when it follows a segment terminator or a line break
+    pos = data.find(tag, start)
+    while pos > 0 and data[pos - 1] not in boundary:
+        pos = data.find(tag, pos + 1)
+    return pos
+
 def basic_validate_edifact_bytes(data: bytes) -> Tuple[bool, str]:
-    try:
-        txt = data.decode("utf-8", errors="replace")
-    except Exception as e:
-        return False, f"decode_error:{e}"
-    if not (txt.startswith("UNA") or txt.startswith("UNB")):
+    if not (data.startswith(b"UNA") or data.startswith(b"UNB")):
         return False, "missing_UNA_or_UNB"
-    if "UNH+" not in txt:
+    if b"UNH+" not in data:
         return False, "missing_UNH"
-    if "UNT+" not in txt:
+    if b"UNT+" not in data:
         return False, "missing_UNT"
-    # check UNH..UNT counts: find first UNH and first UNT after it, count segments between
+    # UNA:+.? ' declares the release character at [6] and the segment terminator at [8]
+    terminator, release = b"'", b"?"
+    if data.startswith(b"UNA") and len(data) >= 9:
+        terminator, release = data[8:9], data[6:7]
+        if release == b" ":
+            release = b""
+    # check UNH..UNT counts: first UNH segment, first UNT segment after it, terminators in between
+    boundary = terminator + b"\n"
+    unh = _find_segment(data, b"UNH+", boundary)
+    if unh < 0:
+        return True, "ok"
+    unt = _find_segment(data, b"UNT+", boundary, unh)
+    if unt < 0:
+        return True, "ok"
+    # every segment before UNT ends in an unescaped terminator, plus UNT itself
+    seg_count = data.count(terminator, unh, unt) + 1
+    if seg_count == 1:
+        # no terminators at all: segments are separated by line breaks only
+        seg_count = data.count(b"\n", unh, unt) + 1
+    elif release:
+        # a terminator is escaped only behind an odd run of release characters (?' escaped, ??' not)
+        rel = release[0]
+        pos = data.find(release + terminator, unh, unt)
+        while pos >= 0:
+            run = 1
+            while pos - run >= unh and data[pos - run] == rel:
+                run += 1
+            if run % 2:
+                seg_count -= 1
+            pos = data.find(release + terminator, pos + 2, unt)
+    # UNT+<count>+<ref>'
+    plus = data.find(b"+", unt + 4)
+    if plus < 0:
+        return True, "ok"
     try:
-        parts = txt.splitlines()
-        # find UNH index
-        unh_idx = next(i for i, ln in enumerate(parts) if ln.startswith("UNH+"))
-        # find UNT index after UNH
-        unt_idx = next(i for i, ln in enumerate(parts[unh_idx:], start=unh_idx) if ln.startswith("UNT+"))
-        seg_count = unt_idx - unh_idx + 1
-        # parse UNT count value after UNT+
-        unt_line = parts[unt_idx]
-        try:
-            # UNT+<count>+<ref>'
-            unt_body = unt_line.split("+")
-            reported_count = int(unt_body[1])
-            if abs(reported_count - seg_count) > 2:
-                # allow minor deviations but warn
-                return True, f"segment_count_mismatch_reported={reported_count}_actual={seg_count}"
-        except Exception:
-            pass
-    except StopIteration:
-        pass
+        reported_count = int(data[unt + 4:plus])
+    except ValueError:
+        return True, "ok"
+    if abs(reported_count - seg_count) > 2:
+        # allow minor deviations but warn
+        return True, f"segment_count_mismatch_reported={reported_count}_actual={seg_count}"
     return True, "ok"
 
 def validate_file(path: str) -> Tuple[bool, str]:
@@ -182,103 +495,298 @@ def validate_file(path: str) -> Tuple[bool, str]:
     valid, note = basic_validate_edifact_bytes(data)
     return valid, note
 
-def move_to_ready(path: str, force: bool = False) -> Tuple[str, str]:
+class MetaLog:
+    # append-only JSON lines, one per message; written and fsynced every META_LOG_FLUSH_EVERY records and on close.
+    # never compacted: the file grows by one line per message until the directory is cleaned out
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, META_LOG)
+        self._pending: List[bytes] = []
+        # reentrant so the SIGTERM handler can close a log the interrupted code was appending to
+        self._lock = threading.RLock()
+
+    def append(self, fname: str, meta: Dict):
+        record = {"file": fname, **meta}
+        with self._lock:
+            self._pending.append(_json_dumps(record) + b"\n")
+            if len(self._pending) >= META_LOG_FLUSH_EVERY:
+                self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        if not self._pending:
+            return
+        # detach the batch first so a reentrant close() cannot write it twice
+        pending, self._pending = self._pending, []
+        _ensure_dir(os.path.dirname(self.path))
+        with open(self.path, "ab") as f:
+            f.writelines(pending)
+            f.flush()
+            os.fsync(f.fileno())
+
+_meta_logs: Dict[str, MetaLog] = {}
+_meta_logs_lock = threading.RLock()
+
+def meta_log(directory: str) -> MetaLog:
+    with _meta_logs_lock:
+        log = _meta_logs.get(directory)
+        if log is None:
+            log = _meta_logs[directory] = MetaLog(directory)
+        return log
+
+def close_meta_logs():
+    with _meta_logs_lock:
+        logs = list(_meta_logs.values())
+    for log in logs:
+        log.close()
+
+atexit.register(close_meta_logs)
+
+def load_meta_log(directory: str) -> Dict[str, Dict]:
+    records = {}
+    try:
+        with open(os.path.join(directory, META_LOG), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn last line after a crash between flushes
+                    continue
+                records[record.get("file")] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+def move_to_ready(path: str, force: bool = False, per_file_meta: bool = False) -> Tuple[str, str]:
     base = os.path.basename(path)
-    dest = os.path.join(READY_DIR, base)
+    _ensure_dir(READY_DIR)
+    dest = _READY + base
     if os.path.exists(dest) and not force:
         raise FileExistsError(dest)
+    # a real copy: the source is outside the pipeline and its owner may keep editing it
     shutil.copy2(path, dest)
-    meta = {"moved_at": datetime.utcnow().isoformat(), "src": path}
-    meta_path = dest + META_EXT
-    with open(meta_path, "w", encoding="utf-8") as mf:
-        json.dump(meta, mf, indent=2)
-    return dest, meta_path
+    meta = {"moved_at": _utc_isoformat(), "src": path}
+    log = meta_log(READY_DIR)
+    log.append(base, meta)
+    if not per_file_meta:
+        return dest, log.path
+    return dest, write_meta_for_send(dest, meta)
 
-def write_meta_for_send(path: str, meta: Dict):
+def write_meta_for_send(path: str, meta: Dict) -> str:
+    # replace, never rewrite in place: sent/ sidecars share an inode with their archive/ copy
     meta_path = path + META_EXT
-    with open(meta_path, "w", encoding="utf-8") as mf:
-        json.dump(meta, mf, indent=2)
+    tmp = meta_path + ".tmp"
+    with open(tmp, "wb") as mf:
+        mf.write(_json_dumps(meta))
+    os.replace(tmp, meta_path)
+    return meta_path
 
 def send_one_file(filepath: str, host: str, port: int, timeout: float = 15.0,
                   tls: bool = False, cafile: Optional[str] = None,
-                  max_attempts: int = 3) -> Tuple[bool, Dict]:
+                  max_attempts: int = 3,
+                  socket_options: Optional[List[SocketOption]] = None,
+                  client: Optional[MllpClient] = None) -> Tuple[bool, Dict]:
+    meta = {"attempts": 0, "sent_at": None, "ack": None, "error": None}
+    try:
+        fh = open(filepath, "rb")
+    except Exception as e:
+        meta["attempts"] = 1
+        meta["error"] = f"read_error:{e}"
+        return False, meta
+    own_client = client is None
+    if own_client:
+        client = MllpClient(host, port, timeout=timeout, tls=tls, cafile=cafile, socket_options=socket_options)
+    try:
+        with fh:
+            for attempt in range(1, max_attempts + 1):
+                meta["attempts"] = attempt
+                try:
+                    resp = client.send(None, payload_file=fh)
+                except SocketOptionError as e:
+                    # a rejected option fails the same way on every attempt
+                    meta["error"] = str(e)
+                    return False, meta
+                meta["sent_at"] = _utc_isoformat()
+                if resp is None:
+                    meta["error"] = "no_ack_or_timeout"
+                    time.sleep(1)
+                    continue
+                try:
+                    ack_text = resp.decode("utf-8", errors="replace")
+                except Exception:
+                    ack_text = "<binary_ack>"
+                meta["ack"] = ack_text
+                return True, meta
+        return False, meta
+    finally:
+        if own_client:
+            client.close()
+
+async def send_one_file_async(filepath: str, host: str, port: int, timeout: float = 15.0,
+                              tls: bool = False, cafile: Optional[str] = None,
+                              max_attempts: int = 3,
+                              socket_options: Optional[List[SocketOption]] = None) -> Tuple[bool, Dict]:
+    loop = asyncio.get_running_loop()
     meta = {"attempts": 0, "sent_at": None, "ack": None, "error": None}
     for attempt in range(1, max_attempts + 1):
         meta["attempts"] = attempt
         try:
-            with open(filepath, "rb") as fh:
-                payload = fh.read()
+            payload = await loop.run_in_executor(None, _read_bytes, filepath)
         except Exception as e:
             meta["error"] = f"read_error:{e}"
             return False, meta
-        resp = mllp_send(host, port, payload, timeout=timeout, tls=tls, cafile=cafile)
-        meta["sent_at"] = datetime.utcnow().isoformat()
+        try:
+            resp = await mllp_send_async(host, port, payload, timeout=timeout, tls=tls, cafile=cafile,
+                                         socket_options=socket_options)
+        except SocketOptionError as e:
+            meta["error"] = str(e)
+            return False, meta
+        meta["sent_at"] = _utc_isoformat()
         if resp is None:
             meta["error"] = "no_ack_or_timeout"
-            time.sleep(1)
+            await asyncio.sleep(1)
             continue
-        try:
-            ack_text = resp.decode("utf-8", errors="replace")
-        except Exception:
-            ack_text = "<binary_ack>"
-        meta["ack"] = ack_text
+        meta["ack"] = resp.decode("utf-8", errors="replace")
         return True, meta
     return False, meta
 
-def process_ready_queue(host: str, port: int, timeout: float = 15.0, tls: bool = False,
-                        cafile: Optional[str] = None, max_attempts: int = 3, archive_on_sent: bool = True):
-    files = sorted([f for f in os.listdir(READY_DIR) if f.lower().endswith(".edi") or True])
-    for fname in files:
-        fpath = os.path.join(READY_DIR, fname)
-        if not os.path.isfile(fpath):
-            continue
-        meta = {"file": fname, "attempts": 0, "sent_at": None, "ack": None, "error": None}
-        ok, prev = validate_file(fpath)
-        if not ok:
-            meta["error"] = f"validation_failed:{prev}"
-            write_meta_for_send(fpath, meta)
-            dest = os.path.join(FAILED_DIR, fname)
-            shutil.move(fpath, dest)
-            try:
-                if os.path.exists(fpath + META_EXT):
-                    shutil.move(fpath + META_EXT, dest + META_EXT)
-            except Exception:
-                pass
-            continue
-        success, send_meta = send_one_file(fpath, host, port, timeout=timeout, tls=tls, cafile=cafile, max_attempts=max_attempts)
-        meta.update(send_meta)
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+def _ensure_queue_dirs(archive_on_sent: bool):
+    for d in (READY_DIR, SENT_DIR, FAILED_DIR):
+        _ensure_dir(d)
+    if archive_on_sent:
+        _ensure_dir(ARCHIVE_DIR)
+
+def _ready_files() -> List[str]:
+    # DirEntry.is_file() answers from the getdents type field, no extra stat per entry;
+    # the .edi suffix check also keeps *.edi.meta.json sidecars and the meta log out
+    with os.scandir(READY_DIR) as it:
+        return sorted(e.name for e in it if e.is_file(follow_symlinks=False) and e.name.lower().endswith(".edi"))
+
+def _move(src: str, dst: str):
+    # same-filesystem moves are a single rename(2); shutil.move adds stat calls before getting there
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+def _fast_copy(src: str, dst: str):
+    # a hardlink shares the inode, so same-filesystem copies move no data; only used for sent/ -> archive/,
+    # whose payloads are never rewritten and whose sidecars are only ever replaced
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        if os.path.samefile(src, dst):
+            return
+        os.unlink(dst)
+        _fast_copy(src, dst)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM):
+            raise
+        shutil.copy2(src, dst)
+
+def _settle_file(fname: str, success: bool, meta: Dict, archive_on_sent: bool, per_file_meta: bool = False):
+    fpath = _READY + fname
+    if per_file_meta:
         write_meta_for_send(fpath, meta)
-        if success:
-            dest = os.path.join(SENT_DIR, fname)
-            shutil.move(fpath, dest)
-            try:
-                shutil.move(fpath + META_EXT, dest + META_EXT)
-            except Exception:
-                pass
-            if archive_on_sent:
-                try:
-                    shutil.copy2(dest, os.path.join(ARCHIVE_DIR, fname))
-                    if os.path.exists(dest + META_EXT):
-                        shutil.copy2(dest + META_EXT, os.path.join(ARCHIVE_DIR, fname + META_EXT))
-                except Exception:
-                    pass
-        else:
-            dest = os.path.join(FAILED_DIR, fname)
-            shutil.move(fpath, dest)
+    if success:
+        dest_dir, dest = SENT_DIR, _SENT + fname
+    else:
+        dest_dir, dest = FAILED_DIR, _FAILED + fname
+    meta_dest = dest + META_EXT
+    _move(fpath, dest)
+    try:
+        _move(fpath + META_EXT, meta_dest)
+    except Exception:
+        pass
+    meta_log(dest_dir).append(fname, meta)
+    if success and archive_on_sent:
+        archived = _ARCHIVE + fname
+        try:
+            _fast_copy(dest, archived)
+            if os.path.exists(meta_dest):
+                _fast_copy(meta_dest, archived + META_EXT)
+            meta_log(ARCHIVE_DIR).append(fname, meta)
+        except Exception:
+            pass
+
+def process_ready_queue(host: str, port: int, timeout: float = 15.0, tls: bool = False,
+                        cafile: Optional[str] = None, max_attempts: int = 3, archive_on_sent: bool = True,
+                        socket_options: Optional[List[SocketOption]] = None, per_file_meta: bool = False):
+    _ensure_queue_dirs(archive_on_sent)
+    # one connection for the whole drain; MllpClient reconnects after a failed exchange
+    with MllpClient(host, port, timeout=timeout, tls=tls, cafile=cafile, socket_options=socket_options) as client:
+        for fname in _ready_files():
+            fpath = _READY + fname
+            meta = {"file": fname, "attempts": 0, "sent_at": None, "ack": None, "error": None}
+            ok, prev = validate_file(fpath)
+            if not ok:
+                meta["error"] = f"validation_failed:{prev}"
+                _settle_file(fname, False, meta, archive_on_sent, per_file_meta)
+                continue
+            success, send_meta = send_one_file(fpath, host, port, timeout=timeout, tls=tls, cafile=cafile, max_attempts=max_attempts,
+                                               client=client)
+            meta.update(send_meta)
+            _settle_file(fname, success, meta, archive_on_sent, per_file_meta)
+
+async def process_ready_queue_async(host: str, port: int, timeout: float = 15.0, tls: bool = False,
+                                    cafile: Optional[str] = None, max_attempts: int = 3,
+                                    archive_on_sent: bool = True, concurrency: int = 8,
+                                    socket_options: Optional[List[SocketOption]] = None,
+                                    per_file_meta: bool = False):
+    _ensure_queue_dirs(archive_on_sent)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    for fname in await loop.run_in_executor(None, _ready_files):
+        queue.put_nowait(fname)
+
+    async def worker():
+        while True:
             try:
-                shutil.move(fpath + META_EXT, dest + META_EXT)
-            except Exception:
-                pass
+                fname = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            fpath = _READY + fname
+            meta = {"file": fname, "attempts": 0, "sent_at": None, "ack": None, "error": None}
+            ok, prev = await loop.run_in_executor(None, validate_file, fpath)
+            if ok:
+                success, send_meta = await send_one_file_async(fpath, host, port, timeout=timeout, tls=tls,
+                                                               cafile=cafile, max_attempts=max_attempts,
+                                                               socket_options=socket_options)
+                meta.update(send_meta)
+            else:
+                success = False
+                meta["error"] = f"validation_failed:{prev}"
+            await loop.run_in_executor(None, _settle_file, fname, success, meta, archive_on_sent, per_file_meta)
+
+    # the worker count is the bound on in-flight connections
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
 
 def list_dir_with_meta(directory: str) -> List[Tuple[str, Optional[Dict]]]:
     out = []
-    for name in sorted(os.listdir(directory)):
-        p = os.path.join(directory, name)
-        if os.path.isdir(p):
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted((e for e in it if not e.is_dir()), key=lambda e: e.name)
+    except FileNotFoundError:
+        return out
+    names = {e.name for e in entries}
+    if not names - {META_LOG}:
+        return out
+    logged = load_meta_log(directory)
+    for e in entries:
+        if e.name == META_LOG:
             continue
-        meta = None
+        p = e.path
+        meta = logged.get(e.name)
         meta_path = p + META_EXT
-        if os.path.exists(meta_path):
+        if meta is None and e.name + META_EXT in names:
             try:
                 with open(meta_path, "r", encoding="utf-8") as mf:
                     meta = json.load(mf)
@@ -287,6 +795,34 @@ def list_dir_with_meta(directory: str) -> List[Tuple[str, Optional[Dict]]]:
         out.append((p, meta))
     return out
 
+def socket_options_from_args(args) -> List[SocketOption]:
+    opts = []
+    if args.sndbuf:
+        opts.append((socket.SOL_SOCKET, socket.SO_SNDBUF, args.sndbuf))
+    if args.rcvbuf:
+        opts.append((socket.SOL_SOCKET, socket.SO_RCVBUF, args.rcvbuf))
+    if args.busy_poll:
+        # values above net.core.busy_read need CAP_NET_ADMIN
+        opts.append((socket.SOL_SOCKET, _busy_poll_optname(), args.busy_poll))
+    return opts
+
+def _busy_poll_optname() -> Optional[int]:
+    # CPython does not export SO_BUSY_POLL; 46 is its value in the Linux uapi headers
+    if sys.platform.startswith("linux"):
+        return getattr(socket, "SO_BUSY_POLL", 46)
+    return getattr(socket, "SO_BUSY_POLL", None)
+
+def _busy_poll_usecs(value: str) -> int:
+    usecs = int(value)
+    if usecs and _busy_poll_optname() is None:
+        raise argparse.ArgumentTypeError("SO_BUSY_POLL is not available on this platform")
+    return usecs
+
+def add_socket_tuning_args(p):
+    p.add_argument("--sndbuf", type=int, default=0, help="SO_SNDBUF in bytes (0 = kernel autotuning)")
+    p.add_argument("--rcvbuf", type=int, default=0, help="SO_RCVBUF in bytes (0 = kernel autotuning)")
+    p.add_argument("--busy-poll", type=_busy_poll_usecs, default=0, help="SO_BUSY_POLL in microseconds for low-latency ACKs (Linux, 0 = off)")
+
 def cli_generate(args):
     data = None
     if args.input:
@@ -295,9 +831,9 @@ def cli_generate(args):
     else:
         print("No input JSON provided; creating a minimal demo message.")
         data = {
-            "message_ref": f"MSG{random.randint(1000,9999)}",
+            "message_ref": _next_ref(),
             "order_number": "ORD-EXAMPLE-1",
-            "order_date": datetime.utcnow().strftime("%Y%m%d"),
+            "order_date": _ts14()[:8],
             "sender": "SENDER",
             "receiver": "RECEIVER",
             "parties": [
@@ -314,16 +850,25 @@ def cli_generate(args):
 
 def cli_validate(args):
     target = args.file
-    if os.path.isdir(target):
-        files = [os.path.join(target, f) for f in os.listdir(target) if f.lower().endswith(".edi") or True]
-    else:
-        files = [target]
-    for f in files:
-        if not os.path.exists(f):
-            print(f"Missing: {f}")
-            continue
-        ok, note = validate_file(f)
-        print(f"{f}: {'OK' if ok else 'INVALID'} ({note})")
+    if not os.path.isdir(target):
+        if not os.path.exists(target):
+            print(f"Missing: {target}")
+            return
+        ok, note = validate_file(target)
+        print(f"{target}: {'OK' if ok else 'INVALID'} ({note})")
+        return
+    with os.scandir(target) as it:
+        files = [e.path for e in it if e.is_file() and e.name.lower().endswith(".edi")]
+    jobs = args.jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) < PARALLEL_VALIDATE_MIN_FILES:
+        for f in files:
+            ok, note = validate_file(f)
+            print(f"{f}: {'OK' if ok else 'INVALID'} ({note})")
+        return
+    # validation is CPU-bound and stateless; chunksize amortizes pickling for many small files
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        for f, (ok, note) in zip(files, ex.map(validate_file, files, chunksize=64)):
+            print(f"{f}: {'OK' if ok else 'INVALID'} ({note})")
 
 def cli_queue(args):
     src = args.file
@@ -331,7 +876,7 @@ def cli_queue(args):
         print(f"Source file not found: {src}")
         return
     try:
-        dest, meta = move_to_ready(src, force=args.force)
+        dest, meta = move_to_ready(src, force=args.force, per_file_meta=args.per_file_meta)
         print(f"Queued: {dest}")
     except FileExistsError as e:
         print(f"Destination exists, use --force to overwrite: {e}")
@@ -345,28 +890,46 @@ def cli_send_one(args):
     if not ok:
         print(f"Validation failed: {note}")
         return
-    success, meta = send_one_file(filepath, args.host, args.port, timeout=args.timeout, tls=args.tls, cafile=args.cafile, max_attempts=args.attempts)
+    success, meta = send_one_file(filepath, args.host, args.port, timeout=args.timeout, tls=args.tls, cafile=args.cafile, max_attempts=args.attempts,
+                                  socket_options=socket_options_from_args(args))
     meta = meta or {}
-    meta["file"] = os.path.basename(filepath)
+    fname = os.path.basename(filepath)
+    meta["file"] = fname
     meta_path = filepath + META_EXT
-    write_meta_for_send(filepath, meta)
+    if args.per_file_meta:
+        write_meta_for_send(filepath, meta)
+    dest_dir = SENT_DIR if success else FAILED_DIR
+    dest = os.path.join(dest_dir, fname)
+    _ensure_dir(dest_dir)
+    _move(filepath, dest)
+    try:
+        _move(meta_path, dest + META_EXT)
+    except Exception:
+        pass
+    meta_log(dest_dir).append(fname, meta)
     if success:
-        dest = os.path.join(SENT_DIR, os.path.basename(filepath))
-        shutil.move(filepath, dest)
-        shutil.move(meta_path, dest + META_EXT)
         print(f"Sent and moved to {dest}")
     else:
-        dest = os.path.join(FAILED_DIR, os.path.basename(filepath))
-        shutil.move(filepath, dest)
-        try:
-            shutil.move(meta_path, dest + META_EXT)
-        except Exception:
-            pass
         print(f"Send failed; moved to {dest}")
 
+def _close_meta_logs_on_signal(signum, frame):
+    close_meta_logs()
+    sys.exit(128 + signum)
+
 def cli_worker(args):
+    # atexit does not run on SIGTERM; without this a killed worker loses up to a batch of log records
+    signal.signal(signal.SIGTERM, _close_meta_logs_on_signal)
     print(f"Processing ready queue: {READY_DIR}")
-    process_ready_queue(args.host, args.port, timeout=args.timeout, tls=args.tls, cafile=args.cafile, max_attempts=args.attempts, archive_on_sent=not args.no_archive)
+    if args.concurrency > 1:
+        asyncio.run(process_ready_queue_async(args.host, args.port, timeout=args.timeout, tls=args.tls, cafile=args.cafile,
+                                              max_attempts=args.attempts, archive_on_sent=not args.no_archive,
+                                              concurrency=args.concurrency, socket_options=socket_options_from_args(args),
+                                              per_file_meta=args.per_file_meta))
+    else:
+        process_ready_queue(args.host, args.port, timeout=args.timeout, tls=args.tls, cafile=args.cafile, max_attempts=args.attempts, archive_on_sent=not args.no_archive,
+                            socket_options=socket_options_from_args(args), per_file_meta=args.per_file_meta)
+    # one fsync per drain for every state directory touched
+    close_meta_logs()
     print("Done.")
 
 def cli_list(args):
@@ -383,6 +946,12 @@ def cli_list(args):
             if meta:
                 print(f"    meta: {meta}")
 
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1, got {n}")
+    return n
+
 def build_parser():
     p = argparse.ArgumentParser(prog="edictl", description="EDIFACT static pipeline + MLLP sender")
     sub = p.add_subparsers(dest="cmd")
@@ -392,10 +961,12 @@ def build_parser():
     g.set_defaults(func=cli_generate)
     v = sub.add_parser("validate", help="Validate an .edi file or directory")
     v.add_argument("file", help="File or directory to validate")
+    v.add_argument("--jobs", type=_positive_int, default=None, help="Worker processes for a directory (default: CPU count)")
     v.set_defaults(func=cli_validate)
     q = sub.add_parser("queue", help="Move an edi file to ready queue")
     q.add_argument("file", help="Path to .edi to queue")
     q.add_argument("--force", action="store_true", help="Overwrite if exists in ready")
+    q.add_argument("--per-file-meta", action="store_true", help=f"Also write a {META_EXT} sidecar next to the file")
     q.set_defaults(func=cli_queue)
     s = sub.add_parser("send-one", help="Send a single .edi over MLLP and wait for ACK")
     s.add_argument("file", help="Path to .edi to send")
@@ -405,6 +976,8 @@ def build_parser():
     s.add_argument("--attempts", type=int, default=3)
     s.add_argument("--tls", action="store_true")
     s.add_argument("--cafile", help="CA file for TLS")
+    add_socket_tuning_args(s)
+    s.add_argument("--per-file-meta", action="store_true", help=f"Also write a {META_EXT} sidecar next to the file")
     s.set_defaults(func=cli_send_one)
     w = sub.add_parser("worker", help="Process ready/ queue and send files")
     w.add_argument("--host", required=True, help="MLLP server host")
@@ -413,7 +986,10 @@ def build_parser():
     w.add_argument("--attempts", type=int, default=3)
     w.add_argument("--tls", action="store_true")
     w.add_argument("--cafile", help="CA file for TLS")
+    add_socket_tuning_args(w)
+    w.add_argument("--per-file-meta", action="store_true", help=f"Also write a {META_EXT} sidecar next to each file")
     w.add_argument("--no-archive", action="store_true", help="Do not copy sent files to archive")
+    w.add_argument("--concurrency", type=int, default=1, help="Concurrent MLLP connections (>1 uses the asyncio pipeline)")
     w.set_defaults(func=cli_worker)
     l = sub.add_parser("list", help="List files and metadata in pipeline directories")
     l.set_defaults(func=cli_list)